@@ -48,7 +48,12 @@ def load_consolidated_model_and_tokenizer(consolidated_path):
         config.distributed.model_dtype
     ]
     model_args = dataclass_from_dict(model_args_cls, config.model, strict=False)
-    tokenizer = build_tokenizer(config.data.tokenizer.name, config.data.tokenizer.path)
+    tokenizer = build_tokenizer(
+        config.data.tokenizer.name,
+        config.data.tokenizer.path,
+        # Older checkpoints were saved before this option existed
+        pat_str=config.data.tokenizer.get("pat_str"),
+    )
     model = model_cls(model_args)
     st_dict = torch.load(ckpt_path / CONSOLIDATE_NAME, weights_only=True)
     model.load_state_dict(st_dict["model"], strict=False)
@@ -101,6 +101,8 @@ class TokenizerState(TypedDict):
     add_bos: bool
     add_eos: bool
     path: Optional[str]
+    max_token_len_cache: int
+    pat_str: Optional[str]
 
 
 class PackTokensState(TypedDict):
@@ -211,6 +213,8 @@ def tokenize(
     add_eos: bool,
     tokenizer_type: str,
     tokenizer_path: Optional[str] = None,
+    max_token_len_cache: int = 0,
+    pat_str: Optional[str] = None,
 ):
     """
     Tokenizes text from an iterator of content-state pairs using a specified tokenizer.
@@ -224,7 +228,12 @@ def tokenize(
     Yields:
     - (tokens, state) pairs, where `tokens` is a list of tokenized text, and `state` is the original state from the iterator.
     """
-    tokenizer = build_tokenizer(name=tokenizer_type, path=tokenizer_path)
+    tokenizer = build_tokenizer(
+        name=tokenizer_type,
+        path=tokenizer_path,
+        max_token_len_cache=max_token_len_cache,
+        pat_str=pat_str,
+    )
     for content, state in iterator:
         assert (
             "text" in content or "content" in content
@@ -238,6 +247,8 @@ def tokenize(
             add_eos=add_eos,
             name=tokenizer_type,
             path=tokenizer_path,
+            max_token_len_cache=max_token_len_cache,
+            pat_str=pat_str,
         )
 
 
@@ -548,6 +559,8 @@ def init_state(
     add_eos: bool,
     tokenizer_name: str,
     tokenizer_path: Optional[str] = None,
+    max_token_len_cache: int = 0,
+    pat_str: Optional[str] = None,
 ):
     multi_choice_state = init_choice_state(
         root_dir=root_dir, sources=sources, seed=seed, rank=rank, world_size=world_size
@@ -558,6 +571,8 @@ def init_state(
         add_eos=add_eos,
         name=tokenizer_name,
         path=tokenizer_path,
+        max_token_len_cache=max_token_len_cache,
+        pat_str=pat_str,
     )
     pack_state = PackTokensState(
         start_token=0,
@@ -617,6 +632,9 @@ def build_dataloader(
         tokenizer_state["add_eos"],
         tokenizer_state["name"],
         tokenizer_state["path"],
+        # Absent from states saved before these options existed
+        tokenizer_state.get("max_token_len_cache", 0),
+        tokenizer_state.get("pat_str"),
     )
 
     data_it = pack_tokens(
@@ -736,6 +754,8 @@ def init_dataloader_state_from_args(
         world_size=world_size,
         tokenizer_name=args.tokenizer.name,
         tokenizer_path=args.tokenizer.path,
+        max_token_len_cache=args.tokenizer.max_token_len_cache,
+        pat_str=args.tokenizer.pat_str,
         add_bos=args.add_bos,
         add_eos=args.add_eos,
     )
@@ -1,12 +1,18 @@
 # Copyright (c) Meta Platforms, Inc. and affiliates.
 
 import abc
+from concurrent.futures import ProcessPoolExecutor
 from copy import copy
 from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 import logging
+import multiprocessing
 import os
+import zlib
+
+import numpy as np
 
 try:
     from sentencepiece import SentencePieceProcessor
@@ -23,6 +29,13 @@ try:
 except ImportError:
     has_tiktoken = False
 
+try:
+    from numba import njit, prange
+
+    has_numba = True
+except ImportError:
+    has_numba = False
+
 logger = logging.getLogger(__name__)
 
 
@@ -30,13 +43,27 @@ logger = logging.getLogger(__name__)
 class TokenizerArgs:
     name: str = "bytes"
     path: Optional[str] = None
+    # tiktoken only: memoize encodings of texts up to this many characters (0 = off)
+    max_token_len_cache: int = 0
+    # tiktoken only: pre-tokenization regex, defaults to DEFAULT_TIKTOKEN_PATTERN
+    pat_str: Optional[str] = None
 
 
 class Tokenizer(abc.ABC):
+    # Tokenizers are created once and their attributes read on every encode call,
+    # so subclasses declare __slots__ instead of carrying a per-instance __dict__
+    __slots__ = ()
+
     @abc.abstractmethod
     def encode(self, tokens, add_bos, add_eos):
         pass
 
+    @abc.abstractmethod
+    def encode_batch(
+        self, texts: List[str], add_bos: bool, add_eos: bool
+    ) -> List[List[int]]:
+        pass
+
     @abc.abstractmethod
     def decode(self, tokens):
         pass
@@ -50,24 +77,88 @@ class Tokenizer(abc.ABC):
 
 
 class MockTokenizer(Tokenizer):
+    """
+    Tokenizer for data that is already tokenized. Inputs are returned as is
+    unless BOS/EOS are requested, and decoding renders the ids as text.
+    """
+
+    __slots__ = ()
     n_words: int = 256
+    bos_id: int = 0
+    eos_id: int = 1
 
-    def encode(self, tokens, add_bos, add_eos):
-        return tokens
+    def encode(self, tokens, add_bos=False, add_eos=False):
+        if not (add_bos or add_eos):
+            return tokens
+        return [self.bos_id] * add_bos + list(tokens) + [self.eos_id] * add_eos
+
+    def encode_batch(self, texts, add_bos=False, add_eos=False):
+        return [self.encode(tokens, add_bos, add_eos) for tokens in texts]
+
+    def decode(self, tokens):
+        return " ".join(map(str, tokens))
+
+    def get_token_offsets(
+        self, text: str, tokens: Optional[List[int]] = None
+    ) -> Tuple[List[str], List[int]]:
+        # Inputs carry no source text to align tokens with
+        return [], []
 
 
 class ByteTokenizer(Tokenizer):
+    __slots__ = ("bos_id", "eos_id", "n_words", "_encoders")
+
     def __init__(self):
         self.bos_id = 256
         self.eos_id = 257
         self.n_words = 258
+        # One specialized encoder per (add_bos, add_eos), indexed by 2 * add_bos + add_eos
+        self._encoders = (
+            self._encode_plain,
+            self._encode_eos_only,
+            self._encode_bos_only,
+            self._encode_bos_eos,
+        )
 
     def encode(self, s: str, add_bos: bool = False, add_eos: bool = False):
-        tokens = [self.bos_id] * add_bos + list(s.encode()) + [self.eos_id] * add_eos
-        return tokens
+        return self._encoders[2 * bool(add_bos) + bool(add_eos)](s)
+
+    def _encode_plain(self, s: str) -> List[int]:
+        return list(s.encode())
+
+    def _encode_bos_only(self, s: str) -> List[int]:
+        return [self.bos_id, *s.encode()]
+
+    def _encode_eos_only(self, s: str) -> List[int]:
+        return [*s.encode(), self.eos_id]
+
+    def _encode_bos_eos(self, s: str) -> List[int]:
+        return [self.bos_id, *s.encode(), self.eos_id]
+
+    def encode_to_array(
+        self, s: str, add_bos: bool = False, add_eos: bool = False
+    ) -> np.ndarray:
+        # Single allocation, bytes copied straight from the encoded buffer
+        raw = s.encode()
+        buf = np.empty(add_bos + len(raw) + add_eos, dtype=np.int32)
+        if add_bos:
+            buf[0] = self.bos_id
+        if add_eos:
+            buf[-1] = self.eos_id
+        buf[add_bos : add_bos + len(raw)] = np.frombuffer(raw, dtype=np.uint8)
+        return buf
+
+    def encode_batch(
+        self, texts: List[str], add_bos: bool = False, add_eos: bool = False
+    ) -> List[List[int]]:
+        return [self.encode(s, add_bos, add_eos) for s in texts]
 
     def decode(self, tokens: List[int]):
-        byte_tokens = bytes([t for t in tokens if t < 256])
+        if isinstance(tokens, np.ndarray):
+            byte_tokens = tokens[(tokens >= 0) & (tokens < 256)].astype(np.uint8).tobytes()
+        else:
+            # Converting a short list to an array costs more than filtering it
+            byte_tokens = bytes([t for t in tokens if 0 <= t < 256])
         return byte_tokens.decode("utf-8", errors="backslashreplace")
 
     def get_token_offsets(
@@ -90,6 +181,8 @@ class ByteTokenizer(Tokenizer):
 
 
 class SentencePieceTokenizer(Tokenizer):
+    __slots__ = ("sp_model", "n_words", "bos_id", "eos_id", "pad_id")
+
     def __init__(self, model_path: str) -> None:
         assert os.path.isfile(model_path), model_path
         self.sp_model = SentencePieceProcessor(model_file=model_path)
@@ -113,6 +206,15 @@ class SentencePieceTokenizer(Tokenizer):
         )
         return tokens
 
+    def encode_batch(
+        self, texts: List[str], add_bos: bool, add_eos: bool
+    ) -> List[List[int]]:
+        assert all(type(s) is str for s in texts)
+        return [
+            [self.bos_id] * add_bos + tokens + [self.eos_id] * add_eos
+            for tokens in self.sp_model.encode(texts)
+        ]
+
     def decode(self, tokens: List[int]):
         return self.sp_model.decode(tokens)
 
@@ -136,28 +238,126 @@ DEFAULT_TIKTOKEN_SPECIAL_TOKENS = {
     "<|fim_suffix|>": 255,
 }
 TIKTOKEN_MAX_ENCODE_CHARS = 400_000
+TIKTOKEN_ENCODE_CACHE_SIZE = 4096
+
+
+def _split_text(s: str, max_chars: int) -> List[str]:
+    # Almost every text fits in one slice: reuse it as is instead of copying
+    if len(s) <= max_chars:
+        return [s] if s else []
+    return [s[i : i + max_chars] for i in range(0, len(s), max_chars)]
+
+
+if has_numba:
+
+    @njit(cache=True, boundscheck=False)
+    def _utf8_token_offsets_nb(buf, lens, out):
+        text_len, pos = 0, 0
+        for t in range(lens.shape[0]):
+            out[t] = max(0, text_len - ((buf[pos] & 0xC0) == 0x80))
+            for i in range(pos, pos + lens[t]):
+                text_len += (buf[i] & 0xC0) != 0x80
+            pos += lens[t]
+
+
+def _utf8_token_offsets(buf: np.ndarray, lens: np.ndarray) -> np.ndarray:
+    """
+    Character offset of each token given the concatenated UTF-8 bytes of all tokens.
+    Every byte that is not a continuation byte (0b10xxxxxx) starts a character, and
+    a token starting mid-character is attributed to the character it completes.
+    Tokens must be non-empty.
+    """
+    if has_numba:
+        out = np.empty(len(lens), dtype=np.int64)
+        _utf8_token_offsets_nb(buf, lens, out)
+        return out
+    starts = np.concatenate([[0], np.cumsum(lens)[:-1]])
+    is_char = ((buf & 0xC0) != 0x80).view(np.uint8)
+    char_counts = np.add.reduceat(is_char, starts, dtype=np.int64)
+    text_len = np.concatenate([[0], np.cumsum(char_counts)[:-1]])
+    return np.maximum(0, text_len - (1 - is_char[starts]))
+
+
+# BPE ranks and Encodings are cached per process: repeated build_tokenizer calls
+# reuse them, and forked data workers share them copy-on-write. Under the spawn
+# start method each worker starts with an empty cache. The returned objects are
+# shared and must not be mutated (Encoding itself is thread-safe).
+@lru_cache(maxsize=4)
+def _load_ranks(model_path: str) -> Dict[bytes, int]:
+    return load_tiktoken_bpe(model_path)
+
+
+@lru_cache(maxsize=4)
+def _load_tiktoken_model(model_path: str, pat_str: str):
+    mergeable_ranks = _load_ranks(model_path)
+    all_special_tokens_with_ids = copy(DEFAULT_TIKTOKEN_SPECIAL_TOKENS)
+    missing_ids = set(range(256)) - set(all_special_tokens_with_ids.values())
+    for id in missing_ids:
+        all_special_tokens_with_ids[f"<|reserved_special_token_{id}|>"] = id
+    for name in all_special_tokens_with_ids:
+        all_special_tokens_with_ids[name] += len(mergeable_ranks)
+
+    # The lookahead in DEFAULT_TIKTOKEN_PATTERN forces tiktoken onto its
+    # backtracking regex engine; a pattern without lookaround runs on the much
+    # faster DFA-based engine. Only override this for models trained with it.
+    tkt_model = tiktoken.core.Encoding(
+        name=Path(model_path).stem,
+        pat_str=pat_str,
+        mergeable_ranks=mergeable_ranks,
+        special_tokens=all_special_tokens_with_ids,
+    )
+
+    # Struct-of-arrays copy of the vocabulary (merges and special tokens) for
+    # lookups: a CRC32 column sorted for searchsorted, the matching ids, and all
+    # keys packed in a single buffer addressed by offsets. CRC32 is stable across
+    # processes, so the table stays valid when a tokenizer is pickled.
+    keys = list(mergeable_ranks) + [name.encode() for name in all_special_tokens_with_ids]
+    ids = list(mergeable_ranks.values()) + list(all_special_tokens_with_ids.values())
+    hashes = np.fromiter(map(zlib.crc32, keys), dtype=np.uint32, count=len(keys))
+    order = np.argsort(hashes, kind="stable")
+    lens = np.fromiter(map(len, keys), dtype=np.int64, count=len(keys))[order]
+    vocab = (
+        hashes[order],
+        np.asarray(ids, dtype=np.int32)[order],
+        np.concatenate([[0], np.cumsum(lens)]),
+        b"".join(keys[i] for i in order),
+    )
+    for arr in vocab[:3]:
+        arr.flags.writeable = False
+    return tkt_model, vocab
 
 
 class TikTokenTokenizer(Tokenizer):
-
-    def __init__(self, model_path: str) -> None:
-        mergeable_ranks = load_tiktoken_bpe(model_path)
-        all_special_tokens_with_ids = copy(DEFAULT_TIKTOKEN_SPECIAL_TOKENS)
-        missing_ids = set(range(256)) - set(all_special_tokens_with_ids.values())
-        for id in missing_ids:
-            all_special_tokens_with_ids[f"<|reserved_special_token_{id}|>"] = id
-        for name in all_special_tokens_with_ids:
-            all_special_tokens_with_ids[name] += len(mergeable_ranks)
-
-        self.tkt_model = tiktoken.core.Encoding(
-            name=Path(model_path).stem,
-            pat_str=DEFAULT_TIKTOKEN_PATTERN,
-            mergeable_ranks=mergeable_ranks,
-            special_tokens=all_special_tokens_with_ids,
-        )
-
-        self.bos_id: int = self.tkt_model.encode_single_token("<|begin_of_text|>")
-        self.eos_id: int = self.tkt_model.encode_single_token("<|end_of_text|>")
+    __slots__ = (
+        "tkt_model",
+        "bos_id",
+        "eos_id",
+        "n_words",
+        "max_token_len_cache",
+        "_encode_cached",
+        "_vocab_hashes",
+        "_vocab_ids",
+        "_vocab_offsets",
+        "_vocab_keys",
+    )
+
+    def __init__(
+        self,
+        model_path: str,
+        max_token_len_cache: int = 0,
+        pat_str: str = DEFAULT_TIKTOKEN_PATTERN,
+    ) -> None:
+        self.tkt_model, vocab = _load_tiktoken_model(model_path, pat_str)
+        # Shared with every instance built from the same model
+        (
+            self._vocab_hashes,
+            self._vocab_ids,
+            self._vocab_offsets,
+            self._vocab_keys,
+        ) = vocab
+
+        self.bos_id: int = self.lookup_token(b"<|begin_of_text|>")
+        self.eos_id: int = self.lookup_token(b"<|end_of_text|>")
 
         self.n_words: int = self.tkt_model.n_vocab
 
@@ -165,17 +365,128 @@ class TikTokenTokenizer(Tokenizer):
             f"#words: {self.n_words} - BOS ID: {self.bos_id} - EOS ID: {self.eos_id}"
         )
 
+        # Opt-in memoization of strings up to max_token_len_cache characters, for
+        # datasets that repeat short strings verbatim (prompts, templates, frequent
+        # fields). Off by default: on mostly unique documents it only costs memory.
+        self.max_token_len_cache = max_token_len_cache
+        self._encode_cached = self._build_encode_cache()
+
+    def _build_encode_cache(self):
+        if self.max_token_len_cache <= 0:
+            return None
+        return lru_cache(maxsize=TIKTOKEN_ENCODE_CACHE_SIZE)(self._encode_tuple)
+
+    def _encode_tuple(self, s: str, add_bos: bool, add_eos: bool) -> Tuple[int, ...]:
+        return tuple(self._encode_list(s, add_bos, add_eos))
+
+    def __getstate__(self):
+        # The encode cache wraps a bound method: drop it and rebuild it on load
+        state = {
+            name: getattr(self, name)
+            for cls in type(self).__mro__
+            for name in getattr(cls, "__slots__", ())
+            if hasattr(self, name)
+        }
+        state["_encode_cached"] = None
+        return state
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+        self._encode_cached = self._build_encode_cache()
+
     def encode(self, s: str, add_bos: bool, add_eos: bool):
         assert isinstance(s, str)
+        if self._encode_cached is not None and len(s) <= self.max_token_len_cache:
+            return list(self._encode_cached(s, add_bos, add_eos))
+        return self._encode_list(s, add_bos, add_eos)
 
-        subs = []
-        for i in range(0, len(s), TIKTOKEN_MAX_ENCODE_CHARS):
-            subs.append(s[i : i + TIKTOKEN_MAX_ENCODE_CHARS])
-        return (
-            [self.bos_id] * add_bos
-            + sum(self.tkt_model.encode_ordinary_batch(subs), start=[])
-            + [self.eos_id] * add_eos
-        )
+    def encode_ndarray(self, s: str, add_bos: bool, add_eos: bool) -> np.ndarray:
+        """Same as encode, but returns an int32 array to skip building a list of ints."""
+        assert isinstance(s, str)
+        if self._encode_cached is not None and len(s) <= self.max_token_len_cache:
+            return np.array(self._encode_cached(s, add_bos, add_eos), dtype=np.int32)
+        return self._encode_ndarray(s, add_bos, add_eos)
+
+    def _encode_list(self, s: str, add_bos: bool, add_eos: bool) -> List[int]:
+        subs = _split_text(s, TIKTOKEN_MAX_ENCODE_CHARS)
+        return self._concat_lists(self._encode_subs(subs), add_bos, add_eos)
+
+    def _encode_ndarray(self, s: str, add_bos: bool, add_eos: bool) -> np.ndarray:
+        subs = _split_text(s, TIKTOKEN_MAX_ENCODE_CHARS)
+        return self._concat_array(self._encode_subs(subs), add_bos, add_eos)
+
+    def _encode_subs(self, subs: List[str], num_threads: int = 8) -> List[List[int]]:
+        # encode_ordinary_batch starts a thread pool on every call: skip it when
+        # there is a single slice, i.e. for almost every text
+        if len(subs) == 1:
+            return [self.tkt_model.encode_ordinary(subs[0])]
+        return self.tkt_model.encode_ordinary_batch(subs, num_threads=num_threads)
+
+    def _concat_lists(
+        self, chunks: List[List[int]], add_bos: bool, add_eos: bool
+    ) -> List[int]:
+        # Lists returned by tiktoken are fresh, so the common single-slice case
+        # needs no copy; several slices are joined with extend, not sum(lists, [])
+        if len(chunks) == 1:
+            if not (add_bos or add_eos):
+                return chunks[0]
+            return [self.bos_id] * add_bos + chunks[0] + [self.eos_id] * add_eos
+        tokens = [self.bos_id] * add_bos
+        for chunk in chunks:
+            tokens.extend(chunk)
+        if add_eos:
+            tokens.append(self.eos_id)
+        return tokens
+
+    def _concat_array(
+        self, chunks: List[List[int]], add_bos: bool, add_eos: bool
+    ) -> np.ndarray:
+        # Write BOS, every chunk and EOS into a single preallocated buffer
+        out = np.empty(add_bos + sum(map(len, chunks)) + add_eos, dtype=np.int32)
+        if add_bos:
+            out[0] = self.bos_id
+        if add_eos:
+            out[-1] = self.eos_id
+        offset = int(add_bos)
+        for chunk in chunks:
+            out[offset : offset + len(chunk)] = chunk
+            offset += len(chunk)
+        return out
+
+    def encode_batch(
+        self, texts: List[str], add_bos: bool, add_eos: bool
+    ) -> List[List[int]]:
+        assert all(isinstance(s, str) for s in texts)
+
+        # Flatten all slices of all texts into a single call so that tiktoken
+        # spreads the whole batch over its thread pool
+        subs, n_subs = [], []
+        for s in texts:
+            text_subs = _split_text(s, TIKTOKEN_MAX_ENCODE_CHARS)
+            subs.extend(text_subs)
+            n_subs.append(len(text_subs))
+        results = self._encode_ordinary_batch(subs)
+
+        out, start = [], 0
+        for n in n_subs:
+            out.append(self._concat_lists(results[start : start + n], add_bos, add_eos))
+            start += n
+        return out
+
+    def _encode_ordinary_batch(self, subs: List[str]) -> List[List[int]]:
+        return self._encode_subs(subs, num_threads=os.cpu_count() or 1)
+
+    def lookup_token(self, token: bytes) -> Optional[int]:
+        """Return the id of a single vocabulary entry, or None if it is not in the vocabulary."""
+        h = zlib.crc32(token)
+        lo = np.searchsorted(self._vocab_hashes, h, side="left")
+        hi = np.searchsorted(self._vocab_hashes, h, side="right")
+        for i in range(lo, hi):
+            start, end = self._vocab_offsets[i], self._vocab_offsets[i + 1]
+            if self._vocab_keys[start:end] == token:
+                return int(self._vocab_ids[i])
+        return None
 
     def decode(self, tokens: List[int]):
         return self.tkt_model.decode(tokens)
@@ -190,15 +501,126 @@ class TikTokenTokenizer(Tokenizer):
                 self.tkt_model.encode(text, allowed_special="all")
             )
 
-        text_len, offsets = 0, []
-        for token in token_bytes:
-            offsets.append(max(0, text_len - (0x80 <= token[0] < 0xC0)))
-            text_len += sum(1 for c in token if not 0x80 <= c < 0xC0)
+        if not token_bytes:
+            return [], []
+
+        lens = np.fromiter(map(len, token_bytes), dtype=np.int64, count=len(token_bytes))
+        all_bytes = np.frombuffer(b"".join(token_bytes), dtype=np.uint8)
+        offsets = _utf8_token_offsets(all_bytes, lens).tolist()
         substrs = [text[s:e] for s, e in zip(offsets, offsets[1:] + [None])]
         return substrs, offsets
 
 
+# Encoding inherited by each forked ShardedTikTokenTokenizer worker
+_shard_tkt_model = None
+
+
+def _init_tiktoken_shard(tkt_model) -> None:
+    global _shard_tkt_model
+    _shard_tkt_model = tkt_model
+
+
+def _encode_tiktoken_shard(subs: List[str]) -> List[List[int]]:
+    return _shard_tkt_model.encode_ordinary_batch(subs, num_threads=1)
+
+
+class ShardedTikTokenTokenizer(TikTokenTokenizer):
+    """
+    TikTokenTokenizer whose encode_batch is spread over a pool of worker processes,
+    each with its own Encoding, instead of the thread pool of a single Encoding.
+    Workers are forked lazily on the first batch so they share the BPE ranks
+    copy-on-write. They are shut down by close(), when leaving a `with` block, or
+    when the tokenizer is garbage collected.
+    """
+
+    __slots__ = ("num_shards", "_pool")
+
+    def __init__(
+        self, model_path: str, num_shards: Optional[int] = None, **kwargs
+    ) -> None:
+        self._pool = None
+        super().__init__(model_path, **kwargs)
+        self.num_shards = num_shards or os.cpu_count() or 1
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.num_shards,
+                mp_context=multiprocessing.get_context("fork"),
+                initializer=_init_tiktoken_shard,
+                initargs=(self.tkt_model,),
+            )
+        return self._pool
+
+    def _encode_ordinary_batch(self, subs: List[str]) -> List[List[int]]:
+        chunks = [
+            subs[idx[0] : idx[-1] + 1]
+            for idx in np.array_split(np.arange(len(subs)), self.num_shards)
+            if len(idx) > 0
+        ]
+        # map preserves the order of the chunks
+        results = []
+        for chunk_result in self._get_pool().map(_encode_tiktoken_shard, chunks):
+            results.extend(chunk_result)
+        return results
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __getstate__(self):
+        # Worker processes are not transferable; a fresh pool is forked on demand
+        state = super().__getstate__()
+        state["_pool"] = None
+        return state
+
+    def __enter__(self) -> "ShardedTikTokenTokenizer":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __del__(self) -> None:
+        # _pool is unset if __init__ failed early
+        if getattr(self, "_pool", None) is not None:
+            self._pool.shutdown(wait=False)
+
+
+if has_numba:
+
+    @njit(parallel=True, cache=True, boundscheck=False)
+    def _aa_encode_nb(buf, lut, out):
+        # Stride-1 and branch-free so that LLVM vectorizes the gather
+        for i in prange(buf.shape[0]):
+            out[i] = lut[buf[i]]
+
+
+# Below this many bytes np.take is as fast as the parallel kernel, and the kernel
+# would start Numba's thread pool in data workers that may fork later
+AA_NUMBA_MIN_BYTES = 10_000
+
+
+def _aa_lookup(buf: np.ndarray, lut: np.ndarray, out: np.ndarray) -> None:
+    if has_numba and len(buf) >= AA_NUMBA_MIN_BYTES:
+        _aa_encode_nb(buf, lut, out)
+    else:
+        np.take(lut, buf, out=out)
+
+
 class AminoAcidTokenizer(Tokenizer):
+    __slots__ = (
+        'SPECIAL_TOKENS',
+        'TOKEN_TO_ID',
+        'ID_TO_TOKEN',
+        'bos_id',
+        'eos_id',
+        'n_words',
+        '_byte_to_id',
+        '_id_to_byte',
+        '_id_to_char',
+        '_enc_table',
+    )
 
     def __init__(self) -> None:
         # Define standard amino acids and their single-letter codes
@@ -223,6 +645,7 @@ class AminoAcidTokenizer(Tokenizer):
         TOKEN_TO_ID.update(SPECIAL_TOKENS)
         ID_TO_TOKEN.update({id_: token for token, id_ in SPECIAL_TOKENS.items()})
 
+        # Kept as public attributes; encode/decode only use the arrays below
         self.SPECIAL_TOKENS = SPECIAL_TOKENS
         self.TOKEN_TO_ID = TOKEN_TO_ID
         self.ID_TO_TOKEN = ID_TO_TOKEN
@@ -232,44 +655,96 @@ class AminoAcidTokenizer(Tokenizer):
         self.eos_id = self.SPECIAL_TOKENS['<EOS>']
         self.n_words = len(TOKEN_TO_ID)
 
+        # Dense lookup tables: ASCII byte -> token id (<UNK> for anything that is
+        # not an amino acid) and token id -> ASCII byte (0 for special tokens)
+        self._byte_to_id = np.full(256, SPECIAL_TOKENS['<UNK>'], dtype=np.int32)
+        self._id_to_byte = np.zeros(self.n_words, dtype=np.uint8)
+        for idx, aa in enumerate(AMINO_ACIDS, start=len(SPECIAL_TOKENS)):
+            self._byte_to_id[ord(aa)] = idx
+            self._id_to_byte[idx] = ord(aa)
+        # Byte -> token id table as bytes, so encode runs as a single bytes.translate in C
+        self._enc_table = self._byte_to_id.astype(np.uint8).tobytes()
+        # Token id -> character ('' for special tokens), for decoding short lists
+        self._id_to_char = tuple(chr(b) if b else '' for b in self._id_to_byte.tolist())
+
     def encode(self, text: str, add_bos: bool = False, add_eos: bool = False) -> List[int]:
-        tokens = []
-        for char in text:
-            token_id = self.TOKEN_TO_ID.get(char, self.SPECIAL_TOKENS['<UNK>'])
-            tokens.append(token_id)
+        # Non-ASCII characters become b'?' (one per character) and map to <UNK>
+        tokens = list(text.encode('ascii', errors='replace').translate(self._enc_table))
         if add_bos:
-            tokens = [self.SPECIAL_TOKENS['<BOS>']] + tokens
+            tokens = [self.bos_id] + tokens
         if add_eos:
-            tokens = tokens + [self.SPECIAL_TOKENS['<EOS>']]
+            tokens = tokens + [self.eos_id]
         return tokens
 
+    def encode_numpy(
+        self, text: str, add_bos: bool = False, add_eos: bool = False
+    ) -> np.ndarray:
+        """Encode into an int32 array, with a parallel Numba kernel for long sequences."""
+        buf = np.frombuffer(text.encode('ascii', errors='replace'), dtype=np.uint8)
+        out = np.empty(add_bos + len(buf) + add_eos, dtype=np.int32)
+        if add_bos:
+            out[0] = self.bos_id
+        if add_eos:
+            out[-1] = self.eos_id
+        _aa_lookup(buf, self._byte_to_id, out[add_bos : add_bos + len(buf)])
+        return out
+
+    def encode_batch(
+        self, texts: List[str], add_bos: bool = False, add_eos: bool = False
+    ) -> List[List[int]]:
+        return [self.encode(text, add_bos, add_eos) for text in texts]
+
+    def encode_batch_numpy(
+        self, texts: List[str], add_bos: bool = False, add_eos: bool = False
+    ) -> List[np.ndarray]:
+        """Encode into one int32 array per sequence, gathering the whole batch in one pass."""
+        if not texts:
+            return []
+        buf = np.frombuffer(''.join(texts).encode('ascii', errors='replace'), dtype=np.uint8)
+        ids = np.empty(len(buf), dtype=np.int32)
+        _aa_lookup(buf, self._byte_to_id, ids)
+        seqs = np.split(ids, np.cumsum([len(text) for text in texts])[:-1])
+        if not (add_bos or add_eos):
+            return seqs
+        bos = np.full(int(add_bos), self.bos_id, dtype=np.int32)
+        eos = np.full(int(add_eos), self.eos_id, dtype=np.int32)
+        return [np.concatenate([bos, seq, eos]) for seq in seqs]
+
     def decode(self, tokens: List[int]) -> str:
-        chars = []
-        for token in tokens:
-            token_str = self.ID_TO_TOKEN.get(token, '<UNK>')
-            if token_str in self.SPECIAL_TOKENS:
-                continue  # Skip special tokens
-            chars.append(token_str)
-        return ''.join(chars)
+        # Unknown ids are dropped like special tokens
+        if isinstance(tokens, np.ndarray):
+            arr = tokens[(tokens >= 0) & (tokens < self.n_words)]
+            return self._id_to_byte[arr].tobytes().replace(b'\x00', b'').decode('ascii')
+        # Converting a short list to an array costs more than indexing a tuple
+        return ''.join([self._id_to_char[t] for t in tokens if 0 <= t < self.n_words])
 
     def get_token_offsets(
         self, text: str, tokens: Optional[List[int]] = None
     ) -> Tuple[List[str], List[int]]:
-        tokens = tokens or self.encode(text)
-        token_texts = []
-        offsets = []
-        idx = 0
-        for token in tokens:
-            token_str = self.ID_TO_TOKEN.get(token, '<UNK>')
-            if token_str in self.SPECIAL_TOKENS:
-                continue  # Skip special tokens
-            token_texts.append(token_str)
-            offsets.append(idx)
-            idx += 1
-        return token_texts, offsets
-
-
-def build_tokenizer(name: str, path: Optional[str] = None) -> Tokenizer:
+        if tokens is None or len(tokens) == 0:
+            tokens = self.encode(text)
+        # Amino acid ids follow the special token ids; everything else is skipped
+        n_special = len(self.SPECIAL_TOKENS)
+        if isinstance(tokens, np.ndarray):
+            mask = (tokens >= n_special) & (tokens < self.n_words)
+            chars = list(self._id_to_byte[tokens[mask]].tobytes().decode('ascii'))
+        else:
+            chars = [
+                self._id_to_char[t] for t in tokens if n_special <= t < self.n_words
+            ]
+        return chars, list(range(len(chars)))
+
+
+def build_tokenizer(
+    name: str,
+    path: Optional[str] = None,
+    max_token_len_cache: int = 0,
+    pat_str: Optional[str] = None,
+) -> Tokenizer:
+    tiktoken_kwargs = dict(
+        max_token_len_cache=max_token_len_cache,
+        pat_str=pat_str or DEFAULT_TIKTOKEN_PATTERN,
+    )
     if name == "bytes":
         return ByteTokenizer()
     elif name == "mock":
@@ -279,7 +754,10 @@ def build_tokenizer(name: str, path: Optional[str] = None) -> Tokenizer:
         return SentencePieceTokenizer(path)
     elif name == "tiktoken":
         assert has_tiktoken, "tiktoken not installed"
-        return TikTokenTokenizer(path)
+        return TikTokenTokenizer(path, **tiktoken_kwargs)
+    elif name == "tiktoken_sharded":
+        assert has_tiktoken, "tiktoken not installed"
+        return ShardedTikTokenTokenizer(path, **tiktoken_kwargs)
     elif name == "aa":
         return AminoAcidTokenizer()
     else:
@@ -0,0 +1,229 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+
+import base64
+import pickle
+
+import numpy as np
+import pytest
+
+import lingua.tokenizer as tokenizer_module
+from lingua.tokenizer import (
+    AminoAcidTokenizer,
+    ByteTokenizer,
+    ShardedTikTokenTokenizer,
+    TikTokenTokenizer,
+    TokenizerArgs,
+    build_tokenizer,
+)
+
+BOS_EOS = [(False, False), (True, False), (False, True), (True, True)]
+
+TEXTS = [
+    "",
+    "the thing",
+    "héllo wörld",
+    "数据 and 😀 emoji 👩‍👩‍👧",
+    "the thing\n" * 50,
+]
+
+
+@pytest.fixture(scope="module")
+def bpe_path(tmp_path_factory):
+    pytest.importorskip("tiktoken")
+    # Byte-level vocabulary with a few merges, including multi-byte ones
+    ranks = [bytes([i]) for i in range(256)]
+    ranks += [b"th", b"the", b" t", b"in", b"ing", "é".encode(), "😀".encode()[:2]]
+    path = tmp_path_factory.mktemp("tokenizer") / "toy.tiktoken"
+    path.write_text(
+        "".join(f"{base64.b64encode(r).decode()} {i}\n" for i, r in enumerate(ranks))
+    )
+    return str(path)
+
+
+def test_sharded_tiktoken_encode_batch(bpe_path):
+    tokenizer = TikTokenTokenizer(bpe_path)
+    with ShardedTikTokenTokenizer(bpe_path, num_shards=3) as sharded:
+        for add_bos, add_eos in [(False, False), (True, False), (True, True)]:
+            assert sharded.encode_batch(TEXTS, add_bos, add_eos) == (
+                tokenizer.encode_batch(TEXTS, add_bos, add_eos)
+            )
+        assert sharded.encode_batch([], True, True) == []
+
+
+def test_tiktoken_long_texts_are_sliced(bpe_path, monkeypatch):
+    # Force every non-trivial text to be split into several slices
+    monkeypatch.setattr(tokenizer_module, "TIKTOKEN_MAX_ENCODE_CHARS", 7)
+    tokenizer = TikTokenTokenizer(bpe_path)
+    model = tokenizer.tkt_model
+    for add_bos, add_eos in BOS_EOS:
+        expected = []
+        for text in TEXTS:
+            # Original implementation of TikTokenTokenizer.encode
+            subs = [text[i : i + 7] for i in range(0, len(text), 7)]
+            expected.append(
+                [tokenizer.bos_id] * add_bos
+                + sum(model.encode_ordinary_batch(subs), start=[])
+                + [tokenizer.eos_id] * add_eos
+            )
+        assert tokenizer.encode_batch(TEXTS, add_bos, add_eos) == expected
+        for text, tokens in zip(TEXTS, expected):
+            assert tokenizer.encode(text, add_bos, add_eos) == tokens
+            arr = tokenizer.encode_ndarray(text, add_bos, add_eos)
+            assert arr.dtype == np.int32 and arr.tolist() == tokens
+
+
+@pytest.mark.parametrize("max_token_len_cache", [0, 16])
+def test_tiktoken_pickle(bpe_path, max_token_len_cache):
+    tokenizer = TikTokenTokenizer(bpe_path, max_token_len_cache=max_token_len_cache)
+    expected = [tokenizer.encode(text, True, True) for text in TEXTS]
+    restored = pickle.loads(pickle.dumps(tokenizer))
+    assert [restored.encode(text, True, True) for text in TEXTS] == expected
+    # Cached results are copies: mutating one must not leak into the next call
+    restored.encode(TEXTS[1], False, False).append(-1)
+    assert restored.encode(TEXTS[1], False, False) == expected[1][1:-1]
+
+
+def test_tiktoken_lookup_token(bpe_path):
+    tokenizer = TikTokenTokenizer(bpe_path)
+    for token_id in range(tokenizer.n_words):
+        token = tokenizer.tkt_model.decode_single_token_bytes(token_id)
+        assert tokenizer.lookup_token(token) == token_id
+    assert tokenizer.lookup_token(b"<|begin_of_text|>") == tokenizer.bos_id
+    assert tokenizer.lookup_token(b"not in vocab") is None
+    # The table is built once per model and survives pickling
+    assert TikTokenTokenizer(bpe_path)._vocab_keys is tokenizer._vocab_keys
+    restored = pickle.loads(pickle.dumps(tokenizer))
+    assert restored.lookup_token(b"the") == tokenizer.lookup_token(b"the")
+
+
+def test_byte_encode_to_array():
+    tokenizer = ByteTokenizer()
+    for text in TEXTS:
+        for add_bos, add_eos in BOS_EOS:
+            # Original implementation of ByteTokenizer.encode
+            expected = [256] * add_bos + list(text.encode()) + [257] * add_eos
+            assert tokenizer.encode(text, add_bos, add_eos) == expected
+            arr = tokenizer.encode_to_array(text, add_bos, add_eos)
+            assert arr.dtype == np.int32 and arr.tolist() == expected
+
+
+def test_byte_decode():
+    tokenizer = ByteTokenizer()
+    tokens = tokenizer.encode("héllo 😀", add_bos=True, add_eos=True)
+    assert tokenizer.decode(tokens) == "héllo 😀"
+    assert tokenizer.decode(np.array(tokens)) == "héllo 😀"
+    # Negative and special ids are dropped
+    assert tokenizer.decode([-1, 256, 104, 257]) == "h"
+    assert tokenizer.decode(np.array([-1, 256, 104, 257])) == "h"
+
+
+def _reference_token_offsets(token_bytes):
+    # Original per-byte implementation of TikTokenTokenizer.get_token_offsets
+    text_len, offsets = 0, []
+    for token in token_bytes:
+        offsets.append(max(0, text_len - (0x80 <= token[0] < 0xC0)))
+        text_len += sum(1 for c in token if not 0x80 <= c < 0xC0)
+    return offsets
+
+
+requires_numba = pytest.mark.skipif(
+    not tokenizer_module.has_numba, reason="numba not installed"
+)
+
+
+@pytest.mark.parametrize("use_numba", [False, pytest.param(True, marks=requires_numba)])
+def test_tiktoken_token_offsets(bpe_path, monkeypatch, use_numba):
+    monkeypatch.setattr(tokenizer_module, "has_numba", use_numba)
+    tokenizer = TikTokenTokenizer(bpe_path)
+    for text in TEXTS[1:]:
+        tokens = tokenizer.encode(text, False, False)
+        token_bytes = tokenizer.tkt_model.decode_tokens_bytes(tokens)
+        expected = _reference_token_offsets(token_bytes)
+        substrs, offsets = tokenizer.get_token_offsets(text, tokens)
+        assert offsets == expected
+        assert "".join(substrs) == text
+        assert tokenizer.get_token_offsets(text) == (substrs, offsets)
+
+    # Tokens starting in the middle of a character
+    token_bytes = ["😀".encode()[:2], "😀".encode()[2:], b"a", "é".encode()[1:], b"bc"]
+    offsets = tokenizer_module._utf8_token_offsets(
+        np.frombuffer(b"".join(token_bytes), dtype=np.uint8),
+        np.array([len(t) for t in token_bytes], dtype=np.int64),
+    )
+    assert offsets.tolist() == _reference_token_offsets(token_bytes)
+
+
+@pytest.mark.parametrize("use_numba", [False, pytest.param(True, marks=requires_numba)])
+def test_amino_acid_encode(monkeypatch, use_numba):
+    monkeypatch.setattr(tokenizer_module, "has_numba", use_numba)
+    # Run the kernel even on the short test sequences
+    monkeypatch.setattr(tokenizer_module, "AA_NUMBA_MIN_BYTES", 0)
+    tokenizer = AminoAcidTokenizer()
+    seqs = ["", "MKTAYIAK", "ARNDXZ?é中V"]
+    for seq in seqs:
+        expected = [tokenizer.TOKEN_TO_ID.get(c, 2) for c in seq]
+        assert tokenizer.encode(seq) == expected
+        assert tokenizer.encode_numpy(seq, True, True).tolist() == [0, *expected, 1]
+        assert tokenizer.decode(tokenizer.encode(seq, True, True)) == "".join(
+            c for c in seq if c in tokenizer.TOKEN_TO_ID
+        )
+    for add_bos, add_eos in BOS_EOS:
+        expected = [tokenizer.encode(seq, add_bos, add_eos) for seq in seqs]
+        assert tokenizer.encode_batch(seqs, add_bos, add_eos) == expected
+        arrays = tokenizer.encode_batch_numpy(seqs, add_bos, add_eos)
+        assert all(arr.dtype == np.int32 for arr in arrays)
+        assert [arr.tolist() for arr in arrays] == expected
+    assert tokenizer.encode_batch_numpy([]) == []
+
+
+def test_amino_acid_decode():
+    tokenizer = AminoAcidTokenizer()
+    tokens = [0, 4, 99, -3, 2, 5, 23, 1]
+    assert tokenizer.decode(tokens) == "ARV"
+    assert tokenizer.decode(np.array(tokens)) == "ARV"
+    assert tokenizer.decode([]) == tokenizer.decode(np.array([], dtype=np.int64)) == ""
+
+
+def test_amino_acid_token_offsets():
+    tokenizer = AminoAcidTokenizer()
+
+    def reference(tokens):
+        # Original per-token implementation of get_token_offsets
+        token_texts, offsets = [], []
+        for token in tokens:
+            token_str = tokenizer.ID_TO_TOKEN.get(token, "<UNK>")
+            if token_str in tokenizer.SPECIAL_TOKENS:
+                continue
+            token_texts.append(token_str)
+            offsets.append(len(offsets))
+        return token_texts, offsets
+
+    for tokens in [[0, 4, 99, -3, 2, 5, 23, 1], [4], [1, 2, 3]]:
+        assert tokenizer.get_token_offsets("", tokens) == reference(tokens)
+        assert tokenizer.get_token_offsets("", np.array(tokens)) == reference(tokens)
+    text = "MKTXAYé"
+    assert tokenizer.get_token_offsets(text) == reference(tokenizer.encode(text))
+
+
+def test_mock_tokenizer():
+    tokenizer = build_tokenizer("mock")
+    tokens = [5, 6, 7]
+    assert tokenizer.encode(tokens, False, False) is tokens
+    assert tokenizer.encode(tokens, True, True) == [0, 5, 6, 7, 1]
+    assert tokenizer.encode_batch([tokens, [8]], True, False) == [[0, 5, 6, 7], [0, 8]]
+    assert tokenizer.decode(tokens) == "5 6 7"
+    assert tokenizer.get_token_offsets("", tokens) == ([], [])
+
+
+def test_build_tiktoken_with_options(bpe_path):
+    args = TokenizerArgs(
+        name="tiktoken", path=bpe_path, max_token_len_cache=16, pat_str=r"\S+|\s+"
+    )
+    tokenizer = build_tokenizer(
+        args.name, args.path, args.max_token_len_cache, args.pat_str
+    )
+    assert tokenizer.max_token_len_cache == 16
+    assert tokenizer.tkt_model._pat_str == r"\S+|\s+"
+    assert build_tokenizer("tiktoken", bpe_path).tkt_model._pat_str == (
+        tokenizer_module.DEFAULT_TIKTOKEN_PATTERN
+    )